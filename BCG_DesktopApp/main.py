@@ -1,9 +1,12 @@
 import sys
 import os
+import json
 import psutil
 import platform
-import speedtest
-from datetime import datetime
+import time
+import threading
+import urllib.request
+from datetime import datetime, timedelta
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
     QApplication,
@@ -13,41 +16,128 @@ from PySide6.QtWidgets import (
     QPushButton,
     QProgressBar,
 )
-from PySide6.QtCore import QTimer, Qt, QThread, Signal
+from PySide6.QtCore import QTimer, Qt, Signal, QObject, QRunnable, QThreadPool, QStandardPaths
 from PySide6.QtGui import QFont, QPalette, QColor
 
-class SystemInfoRetrievalThread(QThread):
-    update_signal = Signal(str)
-    speed_test_complete_signal = Signal(float, str)
+_UNAME = platform.uname()
+_PLATFORM_INFO = f"Platform: {_UNAME.system} {_UNAME.release} {_UNAME.machine}"
 
-    def __init__(self):
+_ICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Images", "Icon.png")
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+_INV_MIB = 1.0 / (1 << 20)
+
+def cached(fn, ttl):
+    """
+    Wrap fn so repeated calls within ttl seconds return the last result.
+    """
+    last = {}
+
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        hit = last.get(key)
+        if hit is not None and now - hit[0] < ttl:
+            return hit[1]
+        value = fn(*args, **kwargs)
+        last[key] = (now, value)
+        return value
+
+    return wrapper
+
+cached_cpu_percent = cached(psutil.cpu_percent, 0.8)
+cached_virtual_memory = cached(psutil.virtual_memory, 0.8)
+
+# Readings taken sooner than this after priming cover too short a window to be meaningful
+CPU_PERCENT_MIN_WINDOW = 0.1
+
+SPEED_TEST_URL = "https://speed.cloudflare.com/__down?bytes=100000000"
+SPEED_TEST_CONNECTIONS = 4
+SPEED_TEST_WARMUP = 2
+SPEED_TEST_DURATION = 10
+SPEED_TEST_PROGRESS_INTERVAL = 0.2
+SPEED_TEST_SOCKET_TIMEOUT = 3
+
+SPEED_TEST_CACHE_FILE = "speed_test.json"
+SPEED_TEST_CACHE_MAX_AGE = 60 * 60
+
+DISK_USAGE_INTERVAL = 5
+
+class SpeedTestSignals(QObject):
+    progress = Signal(float)
+    completed = Signal(float, str)
+    failed = Signal(str)
+    finished = Signal()
+
+class SpeedTestRunnable(QRunnable):
+    def __init__(self, speed_test):
         """
-        A background thread for retrieving system information and performing speed tests.
+        A thread pool task that runs a speed test without stalling the user interface.
         """
         super().__init__()
-        self.speed_test_requested = False
-        self.last_speed_test_time = None
+        self.speed_test = speed_test
+        self.signals = SpeedTestSignals()
 
     def run(self):
         """
-        The main loop of the thread.
+        Run the speed test and report the result with its completion time.
         """
-        while not self.isInterruptionRequested():
-            try:
-                system_info = self.get_system_info()
-                self.update_signal.emit(system_info)
+        try:
+            speed_info = self.speed_test(self.signals.progress.emit)
+            if speed_info is not None:
+                completed_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.signals.completed.emit(speed_info, completed_time)
+        except Exception as e:
+            print(f"Error running speed test: {e}")
+            self.signals.failed.emit(str(e))
+        finally:
+            self.signals.finished.emit()
 
-                if self.speed_test_requested:
-                    speed_info = self.get_speed_test()
-                    self.last_speed_test_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    self.last_speed_test_result = f"Internet Speed: {speed_info:.2f} Mbps"
-                    self.speed_test_complete_signal.emit(speed_info, self.last_speed_test_time)
-                    self.speed_test_requested = False
+class DiskUsageSignals(QObject):
+    completed = Signal(float)
+    finished = Signal()
 
-            except Exception as e:
-                print(f"Error retrieving system info: {e}")
+class DiskUsageThread(threading.Thread):
+    def __init__(self, path):
+        """
+        A daemon thread that reads the disk usage of a path without blocking the user interface or shutdown.
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.signals = DiskUsageSignals()
 
-            self.msleep(1000)
+    def run(self):
+        """
+        Read the disk usage and report the used percentage.
+        """
+        try:
+            self.signals.completed.emit(psutil.disk_usage(self.path).percent)
+        except Exception as e:
+            print(f"Error retrieving disk usage: {e}")
+        finally:
+            self.signals.finished.emit()
+
+class SystemInfoRetriever(QObject):
+    speed_test_progress_signal = Signal(float)
+    speed_test_complete_signal = Signal(float, str)
+    speed_test_failed_signal = Signal(str)
+    disk_usage_signal = Signal(float)
+
+    def __init__(self):
+        """
+        Retrieves system information and dispatches speed tests to the thread pool.
+        """
+        super().__init__()
+        self.speed_test_running = False
+        self.speed_test_cancelled = threading.Event()
+        self.last_speed_test_time = None
+        self.disk_usage_running = False
+        self.last_disk_usage_time = None
+        psutil.cpu_percent(interval=None)
+        self.cpu_primed_time = time.monotonic()
+        self._proc = psutil.Process(os.getpid())
+        with self._proc.oneshot():
+            self._start_time = self._proc.create_time()
 
     def get_system_info(self):
         """
@@ -57,59 +147,218 @@ class SystemInfoRetrievalThread(QThread):
         uptime = self.get_uptime()
         processes_count = self.get_processes_count()
 
-        platform_info = f"Platform: {platform.system()} {platform.release()} {platform.machine()}"
-        return (
-            f"{platform_info}\n"
-            f"Network Sent: {network_info.bytes_sent / (1024 * 1024):.2f} MB\n"
-            f"Network Received: {network_info.bytes_recv / (1024 * 1024):.2f} MB\n"
-            f"Processes Count: {processes_count}\n"
-            f"Uptime: {uptime}"
-        )
+        return "\n".join((
+            _PLATFORM_INFO,
+            f"Network Sent: {network_info.bytes_sent * _INV_MIB:.2f} MB",
+            f"Network Received: {network_info.bytes_recv * _INV_MIB:.2f} MB",
+            f"Processes Count: {processes_count}",
+            f"Uptime: {uptime}",
+        ))
 
     def get_size(self, bytes):
         """
         Convert bytes to human-readable size.
         """
-        sizes = ['B', 'KB', 'MB', 'GB', 'TB']
-        for size in sizes:
-            if bytes < 1024:
-                return f"{bytes:.2f} {size}"
-            bytes /= 1024
-        return f"{bytes:.2f} TB"
+        # Each unit step is 2**10, so the unit index follows from the bit length
+        whole = int(bytes)
+        index = min((whole.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1) if whole > 0 else 0
+        return f"{bytes / (1 << (10 * index)):.2f} {_SIZE_UNITS[index]}"
 
     def get_uptime(self):
         """
         Calculate system uptime.
         """
-        process_create_time = psutil.Process(os.getpid()).create_time()
-        uptime_seconds = psutil.time.time() - process_create_time
-        minutes, _ = divmod(uptime_seconds, 60)
-        hours, minutes = divmod(minutes, 60)
-        days, hours = divmod(hours, 24)
-        return f"{days} days, {hours} hours, {minutes} minutes"
+        uptime = timedelta(seconds=int(time.time() - self._start_time))
+        hours, minutes = uptime.seconds // 3600, uptime.seconds % 3600 // 60
+        return f"{uptime.days} days, {hours} hours, {minutes} minutes"
 
-    def get_speed_test(self):
+    def get_speed_test(self, report_progress=None):
         """
         Perform a speed test and return the download speed in Mbps.
+
+        Downloads SPEED_TEST_URL over parallel connections and measures the throughput
+        once the warmup has passed, calling report_progress with the running speed.
+        Returns None if the test is cancelled.
         """
-        st = speedtest.Speedtest()
-        st.get_best_server()  # Choose the best server automatically
-        download_speed = st.download() / 1024 / 1024  # Convert to Mbps
-        return download_speed
+        received = [0] * SPEED_TEST_CONNECTIONS
+        done = [False] * SPEED_TEST_CONNECTIONS
+        errors = [None] * SPEED_TEST_CONNECTIONS
+        stop = False
+
+        def download(index):
+            try:
+                with urllib.request.urlopen(SPEED_TEST_URL, timeout=SPEED_TEST_SOCKET_TIMEOUT) as response:
+                    while not stop:
+                        chunk = response.read(64 * 1024)
+                        if not chunk:
+                            break
+                        received[index] += len(chunk)
+            except Exception as e:
+                errors[index] = e
+            finally:
+                done[index] = True
+
+        def to_mbps(byte_count, seconds):
+            return byte_count * 8 * _INV_MIB / seconds
+
+        for index in range(SPEED_TEST_CONNECTIONS):
+            threading.Thread(target=download, args=(index,), daemon=True).start()
+
+        start = time.monotonic()
+        warm_time = warm_bytes = None
+        try:
+            while not all(done) and not any(errors) and not self.speed_test_cancelled.is_set():
+                time.sleep(SPEED_TEST_PROGRESS_INTERVAL)
+                now = time.monotonic()
+                total = sum(received)
+                if warm_time is None:
+                    if now - start >= SPEED_TEST_WARMUP:
+                        warm_time, warm_bytes = now, total
+                elif report_progress is not None and now > warm_time and total > warm_bytes:
+                    report_progress(to_mbps(total - warm_bytes, now - warm_time))
+                if now - start >= SPEED_TEST_DURATION:
+                    break
+        finally:
+            stop = True
+        end = time.monotonic()
+        total = sum(received)
+
+        if self.speed_test_cancelled.is_set():
+            return None
+        failures = [error for error in errors if error is not None]
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} of {SPEED_TEST_CONNECTIONS} connections failed: {failures[0]}"
+            ) from failures[0]
+        if total == 0:
+            raise RuntimeError("Speed test did not receive any data")
+
+        # A fast link may finish every download before the warmup ends
+        if warm_time is None or end <= warm_time or total == warm_bytes:
+            return to_mbps(total, end - start)
+        return to_mbps(total - warm_bytes, end - warm_time)
 
     def request_speed_test(self):
         """
-        Request a speed test to be performed.
+        Request a speed test to be performed on the global thread pool.
         """
-        self.speed_test_requested = True
+        if self.speed_test_running:
+            return
+        self.speed_test_running = True
+        self.speed_test_cancelled.clear()
+
+        runnable = SpeedTestRunnable(self.get_speed_test)
+        runnable.signals.progress.connect(self.speed_test_progress_signal)
+        runnable.signals.completed.connect(self.speed_test_completed)
+        runnable.signals.failed.connect(self.speed_test_failed_signal)
+        runnable.signals.finished.connect(self.speed_test_finished)
+        QThreadPool.globalInstance().start(runnable)
+
+    def cancel_speed_test(self):
+        """
+        Ask a running speed test to stop downloading and return without a result.
+        """
+        self.speed_test_cancelled.set()
+
+    def speed_test_completed(self, speed_info, completed_time):
+        """
+        Record the speed test result and forward it to the listeners.
+        """
+        self.last_speed_test_time = completed_time
+        self.last_speed_test_result = f"Internet Speed: {speed_info:.2f} Mbps"
+        self.save_speed_test(speed_info, completed_time)
+        self.speed_test_complete_signal.emit(speed_info, completed_time)
+
+    def get_speed_test_cache_path(self):
+        """
+        Get the path of the persisted speed test result in the application data directory.
+        """
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        return os.path.join(data_dir, SPEED_TEST_CACHE_FILE)
+
+    def save_speed_test(self, speed_info, completed_time):
+        """
+        Persist the speed test result so it can be shown after a restart.
+        """
+        cache_path = self.get_speed_test_cache_path()
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f"{cache_path}.tmp"
+            with open(temp_path, "w") as cache_file:
+                json.dump({"ts": completed_time, "mbps": speed_info}, cache_file)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"Error saving speed test result: {e}")
+
+    def load_speed_test(self):
+        """
+        Return the persisted (speed, time) speed test result if it is recent enough, otherwise None.
+        """
+        cache_path = self.get_speed_test_cache_path()
+        try:
+            if time.time() - os.path.getmtime(cache_path) > SPEED_TEST_CACHE_MAX_AGE:
+                return None
+            with open(cache_path) as cache_file:
+                cached_result = json.load(cache_file)
+            speed_info, completed_time = float(cached_result["mbps"]), cached_result["ts"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f"Error loading speed test result: {e}")
+            return None
+
+        self.last_speed_test_time = completed_time
+        self.last_speed_test_result = f"Internet Speed: {speed_info:.2f} Mbps"
+        return speed_info, completed_time
+
+    def speed_test_finished(self):
+        """
+        Allow a new speed test to be requested.
+        """
+        self.speed_test_running = False
+
+    def request_disk_usage(self):
+        """
+        Refresh the disk usage on a daemon thread if the last reading is stale.
+        """
+        now = time.monotonic()
+        if self.disk_usage_running or (
+            self.last_disk_usage_time is not None
+            and now - self.last_disk_usage_time < DISK_USAGE_INTERVAL
+        ):
+            return
+        self.disk_usage_running = True
+        self.last_disk_usage_time = now
+
+        disk_usage_thread = DiskUsageThread('/')
+        disk_usage_thread.signals.completed.connect(self.disk_usage_signal)
+        disk_usage_thread.signals.finished.connect(self.disk_usage_finished)
+        disk_usage_thread.start()
+
+    def disk_usage_finished(self):
+        """
+        Allow the disk usage to be read again.
+        """
+        self.disk_usage_running = False
+
+    def get_cpu_percent(self):
+        """
+        Get the CPU usage, or None until enough time has passed since priming.
+        """
+        if time.monotonic() - self.cpu_primed_time < CPU_PERCENT_MIN_WINDOW:
+            return None
+        return cached_cpu_percent(interval=None)
 
     def get_processes_count(self):
         """
         Get the number of running processes.
         """
-        return len(list(psutil.process_iter()))
+        return len(psutil.pids())
 
 class SystemInfoApp(QWidget):
+    info_font = None
+    window_icon = None
+
     def __init__(self):
         """
         The main application window for displaying system information.
@@ -117,18 +366,25 @@ class SystemInfoApp(QWidget):
         super().__init__()
 
         self.init_ui()
-        
-        icon_path = os.path.abspath("BCG_DesktopApp/Images/Icon.png")
-        self.setWindowIcon(QIcon(icon_path))
 
-        self.thread = SystemInfoRetrievalThread()
-        self.thread.update_signal.connect(self.update_info_label)
-        self.thread.speed_test_complete_signal.connect(self.update_speed_test_info)
-        self.thread.start()
+        if SystemInfoApp.window_icon is None:
+            SystemInfoApp.window_icon = QIcon(_ICON_PATH)
+        self.setWindowIcon(SystemInfoApp.window_icon)
+
+        self.retriever = SystemInfoRetriever()
+        self.retriever.speed_test_progress_signal.connect(self.update_speed_test_progress)
+        self.retriever.speed_test_complete_signal.connect(self.update_speed_test_info)
+        self.retriever.speed_test_failed_signal.connect(self.show_speed_test_failure)
+        self.retriever.disk_usage_signal.connect(self.update_disk_usage)
+
+        cached_speed_test = self.retriever.load_speed_test()
+        if cached_speed_test is not None:
+            self.update_speed_test_info(*cached_speed_test)
 
-        self.check_thread_timer = QTimer(self)
-        self.check_thread_timer.timeout.connect(self.check_thread)
-        self.check_thread_timer.start(1000)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.refresh_info)
+        self.metrics_timer.start(1000)
+        self.refresh_info()
 
         self.dark_mode = False
 
@@ -140,8 +396,11 @@ class SystemInfoApp(QWidget):
         self.setGeometry(100, 100, 500, 250)
 
         self.info_label = QLabel(self)
+        self.last_info = ""
         self.info_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.info_label.setFont(QFont("Helvetica", 12))
+        if SystemInfoApp.info_font is None:
+            SystemInfoApp.info_font = QFont("Helvetica", 12)
+        self.info_label.setFont(SystemInfoApp.info_font)
 
         self.cpu_label = QLabel("CPU Usage:", self)
         self.memory_label = QLabel("Memory Usage:", self)
@@ -177,6 +436,7 @@ class SystemInfoApp(QWidget):
         layout.addWidget(self.speed_test_button)
 
         self.last_speed_test_label = QLabel(self)
+        self.last_speed_test_text = ""
         layout.addWidget(self.last_speed_test_label)
 
         self.mode_toggle_button = QPushButton("Toggle Light/Dark Mode", self)
@@ -194,49 +454,69 @@ class SystemInfoApp(QWidget):
         """
         Update the information label based on the received system information.
         """
-        self.info_label.setText(system_info)
+        if system_info != self.last_info:
+            self.last_info = system_info
+            self.info_label.setText(system_info)
 
         # Update progress bars
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory_percent = psutil.virtual_memory().percent
-        disk_percent = psutil.disk_usage('/').percent
+        cpu_percent = self.retriever.get_cpu_percent()
+        memory_percent = cached_virtual_memory().percent
 
-        self.cpu_progress_bar.setValue(cpu_percent)
+        if cpu_percent is not None:
+            self.cpu_progress_bar.setValue(cpu_percent)
         self.memory_progress_bar.setValue(memory_percent)
+        self.retriever.request_disk_usage()
+
+    def update_disk_usage(self, disk_percent):
+        """
+        Update the disk usage progress bar with the latest reading.
+        """
         self.disk_progress_bar.setValue(disk_percent)
 
+    def update_speed_test_progress(self, speed_info):
+        """
+        Show the running download speed while a speed test is in progress.
+        """
+        self.last_speed_test_label.setText(f"Speed Test in progress: {speed_info:.2f} Mbps")
+
     def update_speed_test_info(self, speed_info, last_speed_test_time):
         """
         Update the last speed test label with the result and timestamp.
         """
-        self.last_speed_test_label.setText(f"Last Speed Test ({last_speed_test_time}): {speed_info:.2f} Mbps")
+        self.last_speed_test_text = f"Last Speed Test ({last_speed_test_time}): {speed_info:.2f} Mbps"
+        self.last_speed_test_label.setText(self.last_speed_test_text)
 
-    def check_thread(self):
+    def show_speed_test_failure(self, error):
         """
-        Check if the background thread is still running.
+        Replace the in-progress speed with the previous result and the failure reason.
         """
-        if not self.thread.isRunning():
-            self.check_thread_timer.stop()
-            self.info_label.setText("Thread stopped. Check your system.")
+        failure_text = f"Speed Test failed: {error}"
+        if self.last_speed_test_text:
+            failure_text = f"{self.last_speed_test_text}\n{failure_text}"
+        self.last_speed_test_label.setText(failure_text)
 
     def refresh_info(self):
         """
         Refresh the displayed system information.
         """
-        self.thread.get_system_info()
+        try:
+            self.update_info_label(self.retriever.get_system_info())
+        except Exception as e:
+            print(f"Error retrieving system info: {e}")
 
     def request_speed_test(self):
         """
         Request a speed test to be performed.
         """
-        self.thread.request_speed_test()
+        self.retriever.request_speed_test()
 
     def closeEvent(self, event):
         """
-        Handle the closing event by requesting the interruption of the background thread.
+        Handle the closing event by stopping the updates and any running speed test.
         """
-        self.thread.requestInterruption()
-        self.thread.wait()
+        self.metrics_timer.stop()
+        self.retriever.cancel_speed_test()
+        QThreadPool.globalInstance().waitForDone(500)
         event.accept()
 
     def toggle_dark_mode(self):
@@ -263,6 +543,7 @@ class SystemInfoApp(QWidget):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.setApplicationName("BCG_DesktopApp")
     main_window = SystemInfoApp()
     main_window.show()
     sys.exit(app.exec())